@@ -9,7 +9,7 @@ http://www.mathworks.com/matlabcentral/fileexchange/69
 Translated from adsgn.m to Python 2009-07-14 endolith@gmail.com
 """
 
-from numpy import pi, polymul
+from numpy import pi, polymul, sqrt
 from scipy.signal import bilinear
 
 
@@ -37,4 +37,26 @@ def A_weighting(fs):
 
     # Use the bilinear transformation to get the digital filter.
     # (Octave, MATLAB, and PyLab disagree about Fs vs 1/Fs)
-    return bilinear(NUMs, DENs, fs)
\ No newline at end of file
+    return bilinear(NUMs, DENs, fs)
+
+
+def a_weighting_response(f):
+    """Analog A-weighting magnitude response at frequencies `f` (Hz).
+    Returns the linear gain of the IEC 61672-1 A-weighting curve,
+    normalized to unity gain at 1 kHz. Useful for applying A-weighting
+    in the frequency domain (multiplying a spectrum) rather than
+    filtering in the time domain.
+    References:
+       [1] IEC 61672-1: Electroacoustics-Sound Level Meters, 2002.
+    """
+    f1 = 20.598997
+    f2 = 107.65265
+    f3 = 737.86223
+    f4 = 12194.217
+    A1000 = 1.9997
+
+    fsq = f ** 2
+    ra = (f4**2 * fsq**2) / ((fsq + f1**2)
+                             * sqrt((fsq + f2**2) * (fsq + f3**2))
+                             * (fsq + f4**2))
+    return 10 ** (A1000 / 20) * ra
\ No newline at end of file
@@ -3,15 +3,35 @@ import sys
 import glob
 import json
 import argparse
+import functools
 import numpy as np
 import seaborn as sns
 import soundfile as sf
 from scipy import signal
-import scipy.fftpack as fftpack
+from scipy.fft import rfft, next_fast_len
+import scipy.fft
 import matplotlib.pyplot as plt
 
 # local imports
-from A_weighting import A_weighting
+from A_weighting import a_weighting_response
+
+# use pyFFTW for the FFTs when it is available - with plan caching
+# enabled the repeated transforms of the fixed analysis size reuse
+# their FFTW plan instead of re-planning per call
+try:
+    import pyfftw
+    pyfftw.interfaces.cache.enable()
+    pyfftw.interfaces.cache.set_keepalive_time(60)
+    scipy.fft.set_global_backend(pyfftw.interfaces.scipy_fft)
+except ImportError:
+    pyfftw = None
+
+# use numba for the frame-energy search when it is available - the
+# jitted streaming pass needs no temporary arrays at all
+try:
+    import numba
+except ImportError:
+    numba = None
 
 # TODO
 # ------------------------
@@ -47,8 +67,88 @@ test_names = {
     "rev"  : "Reverse",
 }
 
+# ANSI 1/3 octave bands 10-37 (10 Hz - 5000 Hz)
+OCTAVE_BANDS  = np.arange(10, 38)
+OCTAVE_FREQS  = (2 ** ((OCTAVE_BANDS - 30) / 3)) * 1000
+OCTAVE_XTICKS = [str(int(round(f, 0))) for f in OCTAVE_FREQS][15:]
+
+def _compute_band_edges(num_bands):
+    """ Compute the FFT bin index of each 1/3 octave band edge.
+
+    The band widths follow a fixed step-doubling pattern, so the table
+    only depends on the band count and is computed once at import time.
+
+    Params
+    -------
+    num_bands : int
+        Number of 1/3 octave bands.
+
+    Returns
+    -------
+    edges : array
+        FFT bin index of each band edge (num_bands + 1 entries).
+    """
+    edges = [13]
+    step  = 1
+    nbins = 3
+    for idx in range(num_bands):
+        edges.append(edges[-1] + nbins)
+        nbins += step
+        if (idx+1) % 3 == 0:
+            step *= 2
+
+    return np.array(edges)
+
+OCTAVE_BAND_EDGES = _compute_band_edges(OCTAVE_BANDS.shape[0])
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True)
+    def _best_frame(x, frame_size, hop_size, frames):
+        """ Streaming frame-energy argmax via a sliding running sum.
+
+        The running sum of squares is slid forward one hop at a time
+        (subtract the samples leaving the frame, add the ones entering),
+        so the whole search is one pass over the data with no temporary
+        arrays. Frames past the end of the data are clipped, matching
+        the truncating slices of the fallback implementation.
+        """
+        n = x.shape[0]
+        running = 0.0
+        for i in range(min(frame_size, n)):
+            running += x[i] * x[i]
+
+        best        = running
+        best_frame  = 0
+        for frame in range(1, frames):
+            start = frame * hop_size
+            prev  = start - hop_size
+            for i in range(min(prev, n), min(start, n)):
+                running -= x[i] * x[i]
+            for i in range(min(prev + frame_size, n), min(start + frame_size, n)):
+                running += x[i] * x[i]
+            if running > best:
+                best       = running
+                best_frame = frame
+
+        return best_frame
+
+@functools.lru_cache(maxsize=4)
+def _window(N):
+    """ Blackman-Harris analysis window of length N (cached by length). """
+    return signal.windows.blackmanharris(N).astype(np.float32)
+
+@functools.lru_cache(maxsize=4)
+def _aweight_gain(n, fs):
+    """ Squared A-weighting gain over the rfft bins of an n-point frame.
+
+    Cached by frame length and fs; the gain is squared so it can be
+    applied directly to a power spectrum.
+    """
+    g = a_weighting_response(np.fft.rfftfreq(n, 1.0/fs)).astype(np.float32)
+    return g * g
+
 class Analyzer():
-    
+
     def __init__(self, cal_file, cal_fs, cal_type, amb_file, output_dir, file_type, verbose=False):
         self.cal_file     = cal_file        # path to calibration nfile
         self.cal_fs       = cal_fs          # sampling rate of calibration file
@@ -58,13 +158,32 @@ class Analyzer():
         self.file_type    = file_type       # image file type - 'png', 'jpg, 'pdf'
         self.verbose      = verbose         # print of debug information
         #-------------------------------------------------------------------------
-        self.block_size   = 65536           # analysis size
-        self.cal          = self.calibrate()
-        self.amb_analysis = self.analyze(self.amb_file)
+        self.block_size   = next_fast_len(65536, real=True) # analysis size
+        self._scratch     = None            # persistent FFT input buffer
+        self._mag         = None            # persistent magnitude buffer
+
+        # persistent band energy buffer (one extra reduceat segment for
+        # the tail above the last band)
+        self._energy      = np.empty(OCTAVE_BAND_EDGES.shape[0], dtype=np.float32)
+        self._fig_j       = None            # reusable joint plot figure
+        self._ax_j        = None
+        self._fig_f       = None            # reusable frequency plot figure
+        self._ax_f        = None
 
         # load sound level requirements from json defition file
         self.slr = json.load(open("sound_level_reqs.json"))
-    
+
+    @functools.cached_property
+    def cal(self):
+        """ Calibration factor (computed once on first use). """
+        return self.calibrate()
+
+    @functools.cached_property
+    def amb_analysis(self):
+        """ Analysis of the ambient recording (computed once on first use). """
+        return self.analyze(self.amb_file)
+
+
     def load(self, audio_file):
         """ Load audio samples from .wav file.
         
@@ -80,19 +199,82 @@ class Analyzer():
         fs : int
             Sample rate
         """         
-        x, fs = sf.read(audio_file)
-        self.validate_audio(x, fs)
+        x, fs = sf.read(audio_file, dtype="float32")
+        self.validate_audio(x.shape[0], fs, x.shape[1] if x.ndim > 1 else 1)
         if self.verbose:
             print(f"Loaded {x.shape[0]} samples with fs = {fs} from {audio_file}")
         return x, fs
 
-    def one_third_octaves(self, x):
-        """ Load audio samples from .wav file.
-        
+    def load_best_frame(self, audio_file, frame_size):
+        """ Stream a .wav file and return its highest-energy frame.
+
+        Rather than reading the whole file into memory, the file is
+        streamed in overlapping blocks (hop of frame_size/4, matching
+        find_greatest_energy) to locate the frame with the greatest
+        energy, and only that frame is then read back. Peak memory is
+        O(frame_size) instead of O(file size).
+
+        Params
+        -------
+        audio_file : string
+            Path to the audio file to load.
+        frame_size : int
+            Number of samples in the returned frame.
+
+        Returns
+        -------
+        x : array
+            The frame_size samples with the greatest energy.
+        fs : int
+            Sample rate.
+        frame_idx : int
+            Sample offset of the returned frame.
+        """
+        hop_size = frame_size // 4
+
+        with sf.SoundFile(audio_file) as f:
+            fs = f.samplerate
+            self.validate_audio(f.frames, fs, f.channels)
+
+            # pass 1: stream overlapping frames tracking greatest energy
+            # (truncated tail frames are skipped - a short frame would
+            # change the FFT bin width under the fixed band edge table)
+            best_idx    = 0
+            best_energy = -1.0
+            frame_idx   = 0
+            for block in f.blocks(blocksize=frame_size,
+                                  overlap=frame_size - hop_size,
+                                  dtype="float32"):
+                if block.shape[0] < frame_size:
+                    break
+                energy = np.dot(block, block)
+                if energy > best_energy:
+                    best_energy = energy
+                    best_idx    = frame_idx
+                frame_idx += hop_size
+
+            # pass 2: seek back and read only the winning frame
+            f.seek(best_idx)
+            x = f.read(frame_size, dtype="float32")
+
+        if self.verbose:
+            print(f"Loaded frame at {best_idx} with fs = {fs} from {audio_file}")
+
+        return x, fs, best_idx
+
+    def one_third_octaves(self, x, fs):
+        """ Analyze an audio frame with A-weighted 1/3 octave bands.
+
+        A-weighting is applied in the frequency domain by scaling the
+        power spectrum with the analytic IEC 61672-1 response, which
+        replaces the sequential (unvectorizable) IIR filter pass.
+
         Params
         -------
         x : array
             Audio samples to analyze with 1/3 octave bands.
+        fs : int
+            Sample rate of the audio in Hz.
 
         Returns
         -------
@@ -103,37 +285,41 @@ class Analyzer():
         energy: array
             Energy measurements for each of the 1/3 octave bands.
         """   
-        # window the signal
-        w = signal.blackmanharris(x.shape[0])
-        x_w = x * w
+        # window the signal straight into a persistent scratch buffer,
+        # zero-padded to a 5-smooth length so pocketfft never falls back
+        # to a slow (Bluestein) transform
+        n = x.shape[0]
+        n_fast = next_fast_len(n, real=True)
+        if self._scratch is None or self._scratch.shape[0] != n_fast:
+            if pyfftw is not None: # aligned input lets FFTW use SIMD loads
+                self._scratch = pyfftw.empty_aligned(n_fast, dtype=np.float32)
+            else:
+                self._scratch = np.empty(n_fast, dtype=np.float32)
+            self._mag     = np.empty(n_fast//2 + 1, dtype=np.float32)
+        np.multiply(x, _window(n), out=self._scratch[:n])
+        self._scratch[n:] = 0.0
 
         # perform frequency domain analysis
-        y = fftpack.fft(x_w) #/(x.shape[0])
-        y = y[range(x.shape[0]//2)]
-        m = np.abs(y)
-
-        # divide into 1/3 octave bands
-        # ANSI 1/3 octave bands 10-37
-        # (10 Hz - 5000 Hz)
-        bands = np.arange(10,38)
-        octaves = (2 ** ((bands-30)/3))*(1000)
-        xticks = [str(int(round(x_w, 0))) for x_w in octaves][15:]
-        
-        energy    = []
-        step      =  1
-        nbins     =  3
-        start_bin = 13
-        stop_bin  = start_bin + nbins
-
-        for idx, band in enumerate(bands):
-            energy.append(np.sum(m[start_bin:stop_bin]))
-            start_bin += nbins
-            nbins     += step 
-            stop_bin  += nbins
-            if (idx+1) % 3 == 0:
-                step *= 2
-
-        return xticks, bands, np.array(energy)
+        # (rfft returns only the n//2+1 non-redundant bins, and
+        # overwrite_x lets pocketfft reuse the input buffer)
+        y = rfft(self._scratch, overwrite_x=True) #/(x.shape[0])
+
+        # squared magnitude (power) - skips the per-bin sqrt of np.abs,
+        # and summing |y|^2 per band is what Parseval calls for anyway
+        np.multiply(y.real, y.real, out=self._mag)
+        self._mag += y.imag * y.imag
+
+        # apply A weighting in the frequency domain
+        self._mag *= _aweight_gain(n_fast, fs)
+        m = self._mag
+
+        # sum the energy in each band with a single pass over the bins
+        # using the bin edge table precomputed at import time, writing
+        # straight into the preallocated buffer
+        # (the final reduceat segment is the tail above the last band)
+        np.add.reduceat(m, OCTAVE_BAND_EDGES, out=self._energy)
+
+        return OCTAVE_XTICKS, OCTAVE_BANDS, self._energy[:-1]
 
     def calibrate(self, response_time="fast"):
         """ Determine calibration factor.
@@ -157,35 +343,55 @@ class Analyzer():
         # extract the dB SPL target value measured during the calibration
         self.cal_target = int(os.path.basename(self.cal_file).split('_')[1])
 
+        # reuse a saved calibration if the file is unchanged since last run
+        sidecar = self.cal_file + ".cal.json"
+        cal_key = [os.path.basename(self.cal_file),
+                   os.path.getmtime(self.cal_file),
+                   self.cal_fs]
+        if os.path.isfile(sidecar):
+            with open(sidecar) as fp:
+                saved = json.load(fp)
+            if saved["key"] == cal_key:
+                self.fs = self.cal_fs
+                return saved["cal"]
+
         if   response_time == "fast": # 170.67 ms @ 48 kHz
-            N = 8192 
+            N = next_fast_len(8192, real=True)
         elif response_time == "slow": # 1.365 s  @ 48 kHz
-            N = 65536
+            N = self.block_size
         else:
             raise ValueError("Invalid response time. Must be 'fast' or 'slow'.")
 
-        # load audio data and get analysis frame
-        self.cal_audio, self.fs = self.load(self.cal_file)
-        idx = self.find_greatest_energy(self.cal_audio, self.fs, N)
-        self.cal_audio = self.cal_audio[idx:idx+N]
-        
-        # process calibration file (apply A weighting)
-        b, a = A_weighting(self.fs)                                 # create filter
-        cal_a = signal.lfilter(b, a, self.cal_audio)                # apply filter
+        # stream the calibration file and keep the peak-energy frame
+        self.cal_audio, self.fs, _ = self.load_best_frame(self.cal_file, N)
 
-        # window the signal
-        w = signal.blackmanharris(N)
-        cal_aw = cal_a * w
+        # window the signal (float32 throughout, A weighting is
+        # applied to the power spectrum below)
+        w = _window(N)
+        cal_aw = self.cal_audio * w
+
+        # zero-pad up to a 5-smooth length (no-op for power-of-two N)
+        n_fast = next_fast_len(N, real=True)
+        if n_fast != N:
+            cal_aw = np.pad(cal_aw, (0, n_fast - N))
 
         # perform frequency domain analysis
-        y = fftpack.fft(cal_aw) #/(x.shape[0])
-        y = y[range(N//2)]
+        # (rfft returns only the N//2+1 non-redundant bins)
+        y = rfft(cal_aw) #/(x.shape[0])
 
         # sum energy and convert to dBA
-        total_energy = (2.0/N) * np.sum(np.power(np.abs(y),2))
+        # (|y|^2 computed without the sqrt of np.abs, A weighted
+        # by the frequency domain response)
+        p = y.real*y.real + y.imag*y.imag
+        p *= _aweight_gain(n_fast, self.fs)
+        total_energy = (2.0/N) * np.sum(p)
         cal_a = 20 * np.log10(total_energy)
 
-        return cal_a 
+        # save the calibration so later runs can skip the full pipeline
+        with open(sidecar, "w") as fp:
+            json.dump({"key" : cal_key, "cal" : float(cal_a)}, fp)
+
+        return cal_a
 
     def find_greatest_energy(self, data, fs, frame_size):
         """ Find frame of a given length with the greatest RMS energy
@@ -210,13 +416,23 @@ class Analyzer():
         """ 
         hop_size = int((1/4) * frame_size)
         frames = (data.shape[0] // frame_size) * 4
-        rmse = []
-        for frame in range(frames):
-            x = data[(hop_size*frame):(hop_size*frame)+frame_size]
-            frame_rmse = np.sqrt((1/frame_size)*np.sum(np.power(x, 2)))
-            rmse.append(frame_rmse)
 
-        return hop_size * np.argmax(rmse)
+        # jitted streaming search when numba is available - one pass,
+        # two multiply-adds per sample, no temporary arrays
+        if numba is not None:
+            return hop_size * _best_frame(data, frame_size, hop_size, frames)
+
+        # cumulative sum of squares turns each frame energy into the
+        # difference of two entries - one pass over the data instead of
+        # a Python loop over frames (sqrt and 1/frame_size are monotone,
+        # so they can be dropped before the argmax)
+        sq     = data.astype(np.float64)
+        csum   = np.concatenate(([0.0], np.cumsum(sq * sq)))
+        starts = np.minimum(np.arange(frames) * hop_size, csum.shape[0] - 1)
+        stops  = np.minimum(starts + frame_size, csum.shape[0] - 1)
+        energies = csum[stops] - csum[starts]
+
+        return hop_size * np.argmax(energies)
 
     def analyze(self, audio_file):
         """ Analyze a given audio sample by 1/3 octave bands
@@ -238,25 +454,20 @@ class Analyzer():
             frame_idx - Index of the max. energy frame
 
         """ 
-        # get the audio samples from test file
-        x, fs = self.load(audio_file)
-
-        # find the frame with greatest energy
+        # stream the test file and keep the frame with greatest energy
         N = self.block_size
-        idx = self.find_greatest_energy(x, fs, N)
-        x = x[idx:idx+N]
-            
-        # apply A weighting filter to account for human perception
-        b, a = A_weighting(fs)
-        x_a = signal.lfilter(b, a, x)
+        x, fs, idx = self.load_best_frame(audio_file, N)
 
-        # split into 1/3 octave bands
-        xticks, bands, energy = self.one_third_octaves(x_a)
+        # split into 1/3 octave bands (A weighting to account for human
+        # perception is applied in the frequency domain inside)
+        xticks, bands, energy = self.one_third_octaves(x, fs)
 
         # covnert to dB and apply calibration
-        energy = (2.0/N) * np.abs(energy)
-        energy = 20 * np.log10(energy)
-        energy += self.cal_target - self.cal
+        # (energy holds per-band sums of |y|^2, so 10*log10 gives dB)
+        energy = (2.0/N) * energy
+        energy = 10 * np.log10(energy)
+        cal = self.cal # runs the calibration on first use (sets cal_target)
+        energy += self.cal_target - cal
 
         analysis = {
             "audio"     : x,
@@ -319,16 +530,20 @@ class Analyzer():
         width = 0.25
 
         # plotting variables
-        ts = 1.0/self.fs 			    # sampling period		(seconds)
-        n = x.shape[0]					# number of samples 
-        t = n/self.fs					# length of signal		(seconds)
-        tv = np.linspace(frame_idx*(1/self.fs), 
-                         t+frame_idx*(1/self.fs), 
-                         num=n)	        # time points vector	(seconds)
+        n = x.shape[0]					# number of samples
+        tv = (np.arange(n, dtype=np.float32)
+              + frame_idx) / self.fs	# time points vector	(seconds)
 
         # plot joint time domain and frequency
-        fig, ax = plt.subplots(2, 1, figsize=FIGSIZE)
-        ax[0].plot(tv, x, color='#1c4b82')
+        # (the figure is created once and its axes cleared and reused
+        # across files - building a fresh figure per file dominates the
+        # cost of a large batch)
+        if self._fig_j is None:
+            self._fig_j, self._ax_j = plt.subplots(2, 1, figsize=FIGSIZE)
+        fig, ax = self._fig_j, self._ax_j
+        ax[0].clear()
+        ax[1].clear()
+        ax[0].plot(tv, x, color='#1c4b82', rasterized=True)
         ax[0].set_xlim(frame_idx*(1/self.fs), (frame_idx+self.block_size)*(1/self.fs))
         ax[0].set_ylim(-ymax,ymax)
         ax[0].set_xlabel('Time (s)')
@@ -351,12 +566,14 @@ class Analyzer():
         ax[1].spines['top'].set_visible(False)
         ax[1].legend((p1[0], p2[0], p3[0], p4), ('Measured', 'Spec', 'Ambient', '2-Band Spec'))
         ax[1].grid(which='major', axis='y', linestyle='-')
-        
-        plt.savefig(plot_path + '_j' + '.' + self.file_type)
-        plt.close()
+
+        fig.savefig(plot_path + '_j' + '.' + self.file_type)
 
         # plot frequency alone
-        fig, ax = plt.subplots(1, 1, figsize=FIGSIZE)
+        if self._fig_f is None:
+            self._fig_f, self._ax_f = plt.subplots(1, 1, figsize=FIGSIZE)
+        fig, ax = self._fig_f, self._ax_f
+        ax.clear()
         p1 = ax.bar(bands[15:]-width, energy[15:], width, color=COLOR1, zorder=3)
         p2 = ax.bar(bands[15:], self.band_specs, width,  color=COLOR2, zorder=3)
         p3 = ax.bar(bands[15:]+width, self.amb_analysis['energy'][15:], width,  color=COLOR3, zorder=3)
@@ -371,8 +588,18 @@ class Analyzer():
         ax.grid(which='major', axis='y', linestyle='-')
         ax.set_title(plot_title)
 
-        plt.savefig(plot_path + '_f' + '.' + self.file_type)
-        plt.close()
+        fig.savefig(plot_path + '_f' + '.' + self.file_type)
+
+    def __getstate__(self):
+        """ Drop the reusable figures when pickling (e.g. to Pool workers).
+
+        matplotlib figures do not pickle reliably; workers recreate them
+        lazily on their first plot.
+        """
+        state = self.__dict__.copy()
+        state["_fig_j"] = state["_ax_j"] = None
+        state["_fig_f"] = state["_ax_f"] = None
+        return state
 
     def get_test_details(self, audio_file):
         """ Parse the filename to extract details form the test.
@@ -409,31 +636,34 @@ class Analyzer():
 
         return test
 
-    def validate_audio(self, x, fs):
-        """ Validate input audio data.
-        
-        Ensure input is numpy array of floating point data bewteen -1 and 1, 
+    def validate_audio(self, frames, fs, channels):
+        """ Validate input audio properties.
+
+        Operates on the stream metadata so files can be checked without
+        reading their samples into memory.
 
         Params
         -------
-        x : ndarray
-            Input audio data
+        frames : int
+            Number of samples in the input audio
         fs : int
             Sampling rate of the input audio in Hz
+        channels : int
+            Number of channels in the input audio
 
         Returns
         -------
         valid : bool
             True if valid audio
-            
+
         """
-        if x.shape[0] < self.block_size:
+        if frames < self.block_size:
             raise RuntimeError(f"Invalid length - input file must be {self.block_size} samples long")
 
         if fs != self.cal_fs:
             raise RuntimeError(f"Invalid sampling rate - input file must have fs = {self.cal_fs}")
 
-        if x.ndim > 1:
+        if channels > 1:
             raise RuntimeError(f"Invalid channel count - input file must be mono")
 
         return True
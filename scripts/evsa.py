@@ -1,8 +1,28 @@
 import os
 import glob
 import argparse
+import multiprocessing
+
+import matplotlib
+matplotlib.use("Agg") # non-interactive backend for worker processes
+
 from analyzer import Analyzer
 
+# worker-local analyzer set up once per process by the pool initializer
+analyzer = None
+
+def init_worker(shared_analyzer):
+    """ Give each worker the calibrated analyzer (pickled once per process). """
+    global analyzer
+    analyzer = shared_analyzer
+
+def run_one(sample):
+    """ Analyze a single test file in a worker process. """
+    try:
+        analyzer.run(sample)
+    except Exception as e:
+        print(f"Failed to analyze {sample}. Skipping...")
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(prog="ev-sound-analysis")
     parser.add_argument("input", help="path to input directory (containing .wav files)", type=str)
@@ -11,7 +31,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     if args.output:
-        # create output directory if nonexistent 
+        # create output directory if nonexistent
         if not os.path.isdir(args.output):
             os.makedirs(args.output)
     else:
@@ -20,7 +40,7 @@ if __name__ == '__main__':
     if not args.file_type: # default is png
         args.file_type = 'png'
 
-    # get audio files 
+    # get audio files
     cal_files  = glob.glob(os.path.join(args.input, "cal*.wav"))
     amb_files  = glob.glob(os.path.join(args.input, "amb*.wav"))
     test_files = glob.glob(os.path.join(args.input, "[!cal]*.wav"))
@@ -32,15 +52,19 @@ if __name__ == '__main__':
     if len(test_files) < 1:
         raise RuntimeError("No test files found.")
 
-    # create (and calibrate) analyzer
+    # create analyzer
     analyzer = Analyzer(cal_files[0], 48000, 'mean', # calibration file details
-                        amb_files[0],                # ambient file details   
+                        amb_files[0],                # ambient file details
                         args.output, args.file_type, # output plot setttings
                         verbose=False)               # don't show details
 
-    # anaylze all test files
-    for sample in test_files:
-        try:
-            analyzer.run(sample)
-        except Exception as e:
-            print(f"Failed to analyze {sample}. Skipping...")
+    # run calibration and ambient analysis once in the parent so the
+    # cached results ride along to the workers with the analyzer
+    analyzer.cal
+    analyzer.amb_analysis
+
+    # anaylze all test files in parallel (each file is independent)
+    with multiprocessing.Pool(os.cpu_count(),
+                              initializer=init_worker,
+                              initargs=(analyzer,)) as pool:
+        list(pool.imap_unordered(run_one, test_files, chunksize=1))